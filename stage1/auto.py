@@ -2,54 +2,89 @@ from abc import ABC, abstractmethod
 from typing import List, Any, TypeAlias
 import string
 import json
+import os
+import sys
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from datamodel import Listing, Observation, Order, OrderDepth, ProsperityEncoder, Symbol, Trade, TradingState
 from collections import deque
+from operator import itemgetter
 
 JSON: TypeAlias = dict[str, "JSON"] | list["JSON"] | str | int | float | bool | None
 
+# set PROSPERITY_LOG=0 for local backtests that don't need the visualizer logs to skip all logging work
+LOG_ENABLED = os.environ.get("PROSPERITY_LOG", "1") == "1"
+
+# share one default hook instead of building a ProsperityEncoder on every to_json call
+_encoder_default = ProsperityEncoder().default
+
+# sort key for (price, volume) order depth items: volume first, then price to break ties
+_get_volume = itemgetter(1, 0)
+
 class Logger:
     def __init__(self) -> None:
-        self.logs = ""
+        self.logs: list[str] = []
         self.max_log_length = 3750
 
+        # listings don't change during a run, keep the last compressed listings around
+        self._listings = None
+        self._listings_cache: list[tuple[Any, ...]] = []
+
     def print(self, *objects: Any, sep: str = " ", end: str = "\n") -> None:
-        self.logs += sep.join(map(str, objects)) + end
+        if not LOG_ENABLED:
+            return
+
+        self.logs.append(sep.join(map(str, objects)) + end)
 
     def flush(self, state: TradingState, orders: dict[Symbol, list[Order]], conversions: int, trader_data: str) -> None:
-        base_length = len(
-            self.to_json(
-                [
-                    self.compress_state(state, ""),
-                    self.compress_orders(orders),
-                    conversions,
-                    "",
-                    "",
-                ]
+        if not LOG_ENABLED:
+            self.logs.clear()
+            return
+
+        base_json = self.to_json(
+            (
+                self.compress_state(state, ""),
+                self.compress_orders(orders),
+                conversions,
+                "",
+                "",
             )
         )
 
         # We truncate state.traderData, trader_data, and self.logs to the same max. length to fit the log limit
-        max_item_length = (self.max_log_length - base_length) // 3
-
-        print(
-            self.to_json(
-                [
-                    self.compress_state(state, self.truncate(state.traderData, max_item_length)),
-                    self.compress_orders(orders),
-                    conversions,
-                    self.truncate(trader_data, max_item_length),
-                    self.truncate(self.logs, max_item_length),
-                ]
-            )
+        max_item_length = (self.max_log_length - len(base_json)) // 3
+
+        # Only the three string slots differ from the base payload, so splice them in
+        # instead of serializing the whole state a second time
+        head = "[[" + self.to_json(state.timestamp) + ","
+        tail = ',"",""]'
+
+        # Write the line in one call, sys.stdout is looked up each time since backtesters redirect it per run
+        sys.stdout.write(
+            head
+            + self.to_json(self.truncate(state.traderData, max_item_length))
+            + base_json[len(head) + 2 : -len(tail)]
+            + ","
+            + self.to_json(self.truncate(trader_data, max_item_length))
+            + ","
+            + self.to_json(self.truncate("".join(self.logs), max_item_length))
+            + "]\n"
         )
 
-        self.logs = ""
+        self.logs.clear()
 
     def compress_state(self, state: TradingState, trader_data: str) -> list[Any]:
+        # holding a reference to the listings dict means an identity check can't match a different dict
+        if self._listings is not state.listings:
+            self._listings = state.listings
+            self._listings_cache = self.compress_listings(state.listings)
+
         return [
             state.timestamp,
             trader_data,
-            self.compress_listings(state.listings),
+            self._listings_cache,
             self.compress_order_depths(state.order_depths),
             self.compress_trades(state.own_trades),
             self.compress_trades(state.market_trades),
@@ -57,41 +92,31 @@ class Logger:
             self.compress_observations(state.observations),
         ]
 
-    def compress_listings(self, listings: dict[Symbol, Listing]) -> list[list[Any]]:
-        compressed = []
-        for listing in listings.values():
-            compressed.append([listing.symbol, listing.product, listing.denomination])
-
-        return compressed
+    def compress_listings(self, listings: dict[Symbol, Listing]) -> list[tuple[Any, ...]]:
+        return [(listing.symbol, listing.product, listing.denomination) for listing in listings.values()]
 
     def compress_order_depths(self, order_depths: dict[Symbol, OrderDepth]) -> dict[Symbol, list[Any]]:
-        compressed = {}
-        for symbol, order_depth in order_depths.items():
-            compressed[symbol] = [order_depth.buy_orders, order_depth.sell_orders]
-
-        return compressed
-
-    def compress_trades(self, trades: dict[Symbol, list[Trade]]) -> list[list[Any]]:
-        compressed = []
-        for arr in trades.values():
-            for trade in arr:
-                compressed.append(
-                    [
-                        trade.symbol,
-                        trade.price,
-                        trade.quantity,
-                        trade.buyer,
-                        trade.seller,
-                        trade.timestamp,
-                    ]
-                )
-
-        return compressed
+        return {
+            symbol: [order_depth.buy_orders, order_depth.sell_orders] for symbol, order_depth in order_depths.items()
+        }
+
+    def compress_trades(self, trades: dict[Symbol, list[Trade]]) -> list[tuple[Any, ...]]:
+        return [
+            (
+                trade.symbol,
+                trade.price,
+                trade.quantity,
+                trade.buyer,
+                trade.seller,
+                trade.timestamp,
+            )
+            for arr in trades.values()
+            for trade in arr
+        ]
 
     def compress_observations(self, observations: Observation) -> list[Any]:
-        conversion_observations = {}
-        for product, observation in observations.conversionObservations.items():
-            conversion_observations[product] = [
+        conversion_observations = {
+            product: [
                 observation.bidPrice,
                 observation.askPrice,
                 observation.transportFees,
@@ -100,19 +125,20 @@ class Logger:
                 observation.sugarPrice,
                 observation.sunlightIndex,
             ]
+            for product, observation in observations.conversionObservations.items()
+        }
 
         return [observations.plainValueObservations, conversion_observations]
 
-    def compress_orders(self, orders: dict[Symbol, list[Order]]) -> list[list[Any]]:
-        compressed = []
-        for arr in orders.values():
-            for order in arr:
-                compressed.append([order.symbol, order.price, order.quantity])
-
-        return compressed
+    def compress_orders(self, orders: dict[Symbol, list[Order]]) -> list[tuple[Any, ...]]:
+        return [(order.symbol, order.price, order.quantity) for arr in orders.values() for order in arr]
 
     def to_json(self, value: Any) -> str:
-        return json.dumps(value, cls=ProsperityEncoder, separators=(",", ":"))
+        # orjson returns bytes and only accepts str keys by default, order depths are keyed by price
+        if orjson is not None:
+            return orjson.dumps(value, default=_encoder_default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+        return json.dumps(value, default=_encoder_default, separators=(",", ":"))
 
     def truncate(self, value: str, max_length: int) -> str:
         if len(value) <= max_length:
@@ -123,6 +149,8 @@ class Logger:
 logger = Logger()
 
 class Strategy:
+    __slots__ = ("symbol", "limit", "orders")
+
     def __init__(self, symbol: str, limit: int) -> None:
         self.symbol = symbol
         self.limit = limit
@@ -150,10 +178,25 @@ class Strategy:
 
 
 class MarketMakingStrategy(Strategy):
+    __slots__ = (
+        "window_mask",
+        "window_count",
+        "window_len",
+        "window_size",
+        "makeTrades",
+        "mAShort",
+        "mAShort_size",
+        "mALong",
+        "mALong_size",
+    )
+
     def __init__(self, symbol: Symbol, limit: int) -> None:
         super().__init__(symbol, limit)
 
-        self.window = deque()
+        # rolling window stored as a bitmask, bit 0 is the most recent period
+        self.window_mask = 0
+        self.window_count = 0
+        self.window_len = 0
         self.window_size = 10
         self.makeTrades = True
         self.mAShort = deque()
@@ -166,24 +209,56 @@ class MarketMakingStrategy(Strategy):
     def get_true_value(state: TradingState) -> int:
         raise NotImplementedError()
     
+    def update_window(self, position: int) -> tuple[bool, bool]:
+        window_size = self.window_size
+
+        # keep track of the last 10 states, recording True if our position
+        # was at the position limit
+        full_mask = (1 << window_size) - 1
+        window_mask = self.window_mask
+        window_count = self.window_count
+        window_len = self.window_len
+        bit = 1 if abs(position) == self.limit else 0
+        if window_len == window_size:
+            # drop the oldest period as it falls off the window
+            window_count -= (window_mask >> (window_size - 1)) & 1
+        else:
+            window_len += 1
+        window_mask = ((window_mask << 1) | bit) & full_mask
+        window_count += bit
+        self.window_mask = window_mask
+        self.window_count = window_count
+        self.window_len = window_len
+
+        ### define liquidity actions
+        # if we've observed 10 periods AND 5 of these times we've been at our limit AND the most recent period was at the limit
+        soft_liquidate = window_len == window_size and window_count >= window_size / 2 and (window_mask & 1) == 1
+
+        # if we've observed 10 periods AND all 10 of those we were at a limit
+        hard_liquidate = window_mask == full_mask
+        ###
+
+        return soft_liquidate, hard_liquidate
+
     def act(self, state: TradingState) -> None:
         true_value = self.get_true_value(state)
 
+        # bind the attributes used throughout to locals, makeTrades is read after get_true_value may have changed it
+        symbol = self.symbol
+        limit = self.limit
+        orders = self.orders
+        make_trades = self.makeTrades
 
-        order_depth = state.order_depths[self.symbol]
+        order_depth = state.order_depths[symbol]
         buy_orders = sorted(order_depth.buy_orders.items(), reverse=True)
         sell_orders = sorted(order_depth.sell_orders.items())
         
         # find out how many items we can buy/sell
-        position = state.position.get(self.symbol, 0)
-        to_buy = self.limit - position
-        to_sell = self.limit + position
+        position = state.position.get(symbol, 0)
+        to_buy = limit - position
+        to_sell = limit + position
 
-        # keep track of the last 10 states, recording True if our position
-        # was at the position limit
-        self.window.append(abs(position) == self.limit)
-        if len(self.window) > self.window_size:
-            self.window.popleft()
+        soft_liquidate, hard_liquidate = self.update_window(position)
 
         #MA's
         # self.mAShort.append(state.observations.plainValueObservations["KELP"].bidPrice)
@@ -194,92 +269,158 @@ class MarketMakingStrategy(Strategy):
         # if len(self.mALong) > self.mALong_size:
         #     self.mALong.popleft()
 
-        
-        ### define liquidity actions
-        # if we've observed 10 periods AND 5 of these times we've been at our limit AND the most recent period was at the limit
-        soft_liquidate = len(self.window) == self.window_size and sum(self.window) >= self.window_size / 2 and self.window[-1]
-
-        # if we've observed 10 periods AND all 10 of those we were at a limit
-        hard_liquidate = len(self.window) == self.window_size and all(self.window)
-        ###
 
         # if we already have a few of the asset, have a slightly lower max buy price
-        max_buy_price = true_value - 1 if position > self.limit * 0.5 else true_value
+        max_buy_price = true_value - 1 if position > limit * 0.5 else true_value
         # if we are already short a few, have a slightly higher min sell price
-        min_sell_price = true_value + 1 if position < self.limit * -0.5 else true_value
+        min_sell_price = true_value + 1 if position < limit * -0.5 else true_value
+
+        # go through the price/volume in sell_orders, cheapest first
+        if make_trades:
+            for price, volume in sell_orders:
+                # stop once we can't buy more or the price is no longer right, later asks are only higher
+                if to_buy <= 0 or price > max_buy_price:
+                    break
 
-        # go through all the price/volume in sell_orders
-        for price, volume in sell_orders:
-            # if we are in a position to buy and the price is right, buy
-            if to_buy > 0 and price <= max_buy_price and self.makeTrades:
                 quantity = min(to_buy, -volume)
-                self.buy(price, quantity)
+                orders.append(Order(symbol, price, quantity))
                 to_buy -= quantity
 
         # if we are in a position to buy and we need to liquidate BADLY!
         if to_buy > 0 and hard_liquidate:
             # put out a bunch of buy orders
             quantity = to_buy // 2
-            self.buy(true_value, quantity)
+            orders.append(Order(symbol, true_value, quantity))
             to_buy -= quantity
 
         # if we are in a position to buy and we need to liquidate KINDA BAD
         if to_buy > 0 and soft_liquidate:
             # put out a bunch of buy orders but we're not down bad on price
             quantity = to_buy
-            self.buy(true_value - 2, quantity)
+            orders.append(Order(symbol, true_value - 2, quantity))
             to_buy -= quantity
 
         # if we are in a position to buy
-        if to_buy > 0 and self.makeTrades:
-            # the "popular price" is the price corresponding to the order w/ the least orders
+        if to_buy > 0 and make_trades:
+            # the "popular price" is the price level with the most volume (highest price on ties)
             # if the popular buy price is below our theo, go long
-            popular_buy_price = max(buy_orders, key=lambda tup: tup[1])[0]
+            popular_buy_price = max(order_depth.buy_orders.items(), key=_get_volume)[0]
             price = min(max_buy_price, popular_buy_price + 1)
-            self.buy(price, to_buy)
+            orders.append(Order(symbol, price, to_buy))
         
-        # go through all the price, volume in buy orders 
-        for price, volume in buy_orders:
-            # if we are in a position to sell and we can sell above our min
-            # sell to all of these bids
-            if to_sell > 0 and price >= min_sell_price and self.makeTrades:
+        # go through the price, volume in buy orders, highest first
+        if make_trades:
+            for price, volume in buy_orders:
+                # stop once we can't sell more or the bid is below our min, later bids are only lower
+                if to_sell <= 0 or price < min_sell_price:
+                    break
+
+                # sell to all of these bids
                 quantity = min(to_sell, volume)
-                self.sell(price, quantity)
+                orders.append(Order(symbol, price, -quantity))
                 to_sell -= quantity
 
         # if we are in a position to sell where we need to liquidate BADLY!
         if to_sell > 0 and hard_liquidate:
             # put out a bunch of sell orders up to half our potential sells
             quantity = to_sell // 2
-            self.sell(true_value, quantity)
+            orders.append(Order(symbol, true_value, -quantity))
             to_sell -= quantity
 
         # if we are in a position to sell where we need to liquidate KINDA BAD
         if to_sell > 0 and soft_liquidate:
             # put out a bunch of sell orders but not down as bad on price
             quantity = to_sell // 2
-            self.sell(true_value + 2, quantity)
+            orders.append(Order(symbol, true_value + 2, -quantity))
             to_sell -= quantity
 
         # if we are in a position to sell
-        if to_sell > 0 and self.makeTrades:
-            # the "popular price" is the price corresponding to the order w/ the least orders
+        if to_sell > 0 and make_trades:
+            # the "popular price" is the price level with the most volume, sell volumes are negative
+            # so that is the minimum (lowest price on ties)
             # if the popular sell price is above ours, make this our theo
-            popular_sell_price = min(sell_orders, key=lambda tup: tup[1])[0]
+            popular_sell_price = min(order_depth.sell_orders.items(), key=_get_volume)[0]
             price = max(min_sell_price, popular_sell_price - 1)
-            self.sell(price, to_sell)
+            orders.append(Order(symbol, price, -to_sell))
 
     def save(self) -> JSON:
-        return list(self.window)
+        return [self.window_mask, self.window_count, self.window_len]
 
     def load(self, data: JSON) -> None:
-        self.window = deque(data)
+        self.window_mask, self.window_count, self.window_len = data
 
 class RainforestResinStrategy(MarketMakingStrategy):
+    __slots__ = ()
+
     def get_true_value(self, state: TradingState):
         return 10_000
 
+    def act(self, state: TradingState) -> None:
+        # MarketMakingStrategy.act with the constant 10_000 true value folded in,
+        # makeTrades is never turned off for resin so there is nothing to check
+        symbol = self.symbol
+        limit = self.limit
+        orders = self.orders
+
+        order_depth = state.order_depths[symbol]
+        buy_orders = sorted(order_depth.buy_orders.items(), reverse=True)
+        sell_orders = sorted(order_depth.sell_orders.items())
+
+        position = state.position.get(symbol, 0)
+        to_buy = limit - position
+        to_sell = limit + position
+
+        soft_liquidate, hard_liquidate = self.update_window(position)
+
+        max_buy_price = 9_999 if position > limit * 0.5 else 10_000
+        min_sell_price = 10_001 if position < limit * -0.5 else 10_000
+
+        for price, volume in sell_orders:
+            if to_buy <= 0 or price > max_buy_price:
+                break
+
+            quantity = min(to_buy, -volume)
+            orders.append(Order(symbol, price, quantity))
+            to_buy -= quantity
+
+        if to_buy > 0 and hard_liquidate:
+            quantity = to_buy // 2
+            orders.append(Order(symbol, 10_000, quantity))
+            to_buy -= quantity
+
+        if to_buy > 0 and soft_liquidate:
+            orders.append(Order(symbol, 9_998, to_buy))
+            to_buy = 0
+
+        if to_buy > 0:
+            popular_buy_price = max(order_depth.buy_orders.items(), key=_get_volume)[0]
+            orders.append(Order(symbol, min(max_buy_price, popular_buy_price + 1), to_buy))
+
+        for price, volume in buy_orders:
+            if to_sell <= 0 or price < min_sell_price:
+                break
+
+            quantity = min(to_sell, volume)
+            orders.append(Order(symbol, price, -quantity))
+            to_sell -= quantity
+
+        if to_sell > 0 and hard_liquidate:
+            quantity = to_sell // 2
+            orders.append(Order(symbol, 10_000, -quantity))
+            to_sell -= quantity
+
+        if to_sell > 0 and soft_liquidate:
+            quantity = to_sell // 2
+            orders.append(Order(symbol, 10_002, -quantity))
+            to_sell -= quantity
+
+        if to_sell > 0:
+            popular_sell_price = min(order_depth.sell_orders.items(), key=_get_volume)[0]
+            orders.append(Order(symbol, max(min_sell_price, popular_sell_price - 1), -to_sell))
+
 class KelpStrategy(MarketMakingStrategy):
+    __slots__ = ()
+
     def get_true_value(self, state: TradingState):
         # TradingState.position current position
         # TradingState.observations 
@@ -304,10 +445,14 @@ class KelpStrategy(MarketMakingStrategy):
         temp = state.market_trades["KELP"] 
         price_sum = 0
         time_weight = 0
-        
+
+        # older trades get a weight of 1 + 0.01 per timestamp of age
+        # market_trades only holds the latest trades rather than the full history, so this can't be kept as a running sum
+        time_base = 1 + cur_time * 0.01
         for i in temp:
-            price_sum += i.price * i.quantity * ((cur_time - i.timestamp) / 100 + 1)
-            time_weight += ((cur_time - i.timestamp) / 100 + 1) * i.quantity
+            weight = (time_base - i.timestamp * 0.01) * i.quantity
+            price_sum += i.price * weight
+            time_weight += weight
 
         if len(temp) < 2: self.makeTrades = False
             
@@ -369,7 +514,8 @@ class Trader:
 
         conversions = 0
 
-        old_trader_data = json.loads(state.traderData) if state.traderData != "" else {}
+        loads = orjson.loads if orjson is not None else json.loads
+        old_trader_data = loads(state.traderData) if state.traderData != "" else {}
         new_trader_data = {}
 
         orders = {}
@@ -382,7 +528,11 @@ class Trader:
 
             new_trader_data[symbol] = strategy.save()
 
-        trader_data = json.dumps(new_trader_data, separators=(",", ":"))
+        # orjson output is already compact
+        if orjson is not None:
+            trader_data = orjson.dumps(new_trader_data).decode()
+        else:
+            trader_data = json.dumps(new_trader_data, separators=(",", ":"))
 
         logger.flush(state, orders, conversions, trader_data)
         return orders, conversions, trader_data
@@ -18,11 +18,6 @@ def find_most_profitable_arbitrage(nodes, edges, start_node, max_trades=5):
     if start_node not in nodes:
         return 1.0, []
     
-    # Create a rate lookup for efficient profit calculation
-    rate_lookup = {}
-    for u, v, rate in edges:
-        rate_lookup[(u, v)] = rate
-    
     # Convert to negative log for Bellman-Ford
     # We use negative log to find shortest path (maximize profit)
     log_edges = [(u, v, -math.log(rate)) for u, v, rate in edges]
@@ -32,85 +27,59 @@ def find_most_profitable_arbitrage(nodes, edges, start_node, max_trades=5):
     for u, v, weight in log_edges:
         graph[u].append((v, weight))
     
-    # Function to calculate profit of a path
-    def calculate_profit(path):
-        profit = 1.0
-        for i in range(len(path) - 1):
-            from_node, to_node = path[i], path[i+1]
-            profit *= rate_lookup.get((from_node, to_node), 0)
-        return profit
+    # Same adjacency list but by node position, so the Bellman-Ford tables can be flat lists
+    n = len(nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    start = index[start_node]
+    adjacency = [[(index[v], weight) for v, weight in graph[u]] for u in nodes]
     
-    # Use a more exhaustive approach to find cycles
+    # Bellman-Ford over a fixed number of steps finds the best walk of exactly that many trades,
+    # revisiting nodes is fine since every trade along the walk is allowed
     best_profit = 1.0
     best_path = []
     
-    # Run modified Bellman-Ford for each possible cycle length
-    for cycle_length in range(2, max_trades + 2):  # +2 because we count start_node twice
-        # Initialize distances for this iteration
-        distances = {node: {0: float('inf')} for node in nodes}
-        distances[start_node][0] = 0
-        
-        # Initialize predecessors for path reconstruction
-        predecessors = {node: {0: None} for node in nodes}
-        
-        # Relax edges for each step in the path
-        for step in range(1, cycle_length):
-            for u in nodes:
-                if step-1 not in distances[u]:
-                    continue
-                    
-                for v, weight in graph[u]:
-                    if step not in distances[v] or distances[u][step-1] + weight < distances[v].get(step, float('inf')):
-                        distances[v][step] = distances[u][step-1] + weight
-                        predecessors[v][step] = u
-        
-        # Check for paths back to start_node
-        for step in range(1, cycle_length):
-            if step in distances[start_node] and distances[start_node][step] < 0:
-                # Reconstruct path
-                path = [start_node]
-                current = start_node
-                current_step = step
-                
-                while current_step > 0:
-                    current = predecessors[current][current_step]
-                    path.insert(0, current)
-                    current_step -= 1
-                
-                path.append(start_node)  # Complete the cycle
-                
-                # Calculate profit and update if better
-                profit = calculate_profit(path)
-                if profit > best_profit:
-                    best_profit = profit
-                    best_path = path
+    # Run modified Bellman-Ford once, the table for max_trades steps also holds every shorter cycle
+    # distances[step][i] is the lowest weight of a walk of step trades from start_node to node i
+    distances = [[float('inf')] * n for _ in range(max_trades + 1)]
+    distances[0][start] = 0
     
-    # Use a second approach: k-length simple paths
-    def dfs(node, path, visited, depth):
-        nonlocal best_profit, best_path
-        
-        if depth == 0:
-            if node == start_node and len(path) > 1:
-                cycle_path = path + [start_node]
-                profit = calculate_profit(cycle_path)
-                if profit > best_profit:
-                    best_profit = profit
-                    best_path = cycle_path
-            return
-        
-        visited.add(node)
-        for neighbor, _ in graph[node]:
-            if neighbor not in visited or neighbor == start_node:
-                path.append(neighbor)
-                if neighbor != start_node:
-                    dfs(neighbor, path, visited, depth - 1)
-                else:
-                    dfs(neighbor, path, visited, 0)  # Force end if we reach start_node
-                path.pop()
-        visited.remove(node)
+    # predecessors[step][i] is the node index we came from to reach node i at this step
+    predecessors = [[-1] * n for _ in range(max_trades + 1)]
+    
+    # Relax edges for each step in the path, skipping nodes not reachable in step-1 trades
+    for step in range(1, max_trades + 1):
+        previous = distances[step-1]
+        current_distances = distances[step]
+        current_predecessors = predecessors[step]
+        for i, neighbors in enumerate(adjacency):
+            distance = previous[i]
+            if distance == float('inf'):
+                continue
+            
+            for j, weight in neighbors:
+                if distance + weight < current_distances[j]:
+                    current_distances[j] = distance + weight
+                    current_predecessors[j] = i
     
-    # Start DFS from the start node
-    dfs(start_node, [start_node], set(), max_trades)
+    # Check for paths back to start_node
+    # distances[step][start] is -sum(log(rate)) over the best cycle, so its profit is exp(-distance)
+    best_step = 0
+    for step in range(1, max_trades + 1):
+        profit = math.exp(-distances[step][start])
+        if profit > best_profit:
+            best_profit = profit
+            best_step = step
+    
+    # Reconstruct path, only for the best cycle
+    if best_step > 0:
+        best_path = [start_node]
+        current = start
+        current_step = best_step
+        
+        while current_step > 0:
+            current = predecessors[current_step][current]
+            best_path.insert(0, nodes[current])
+            current_step -= 1
     
     return best_profit, best_path
 
@@ -155,5 +124,5 @@ if __name__ == "__main__":
 
 
 
-# Most profitable arbitrage cycle: SEASHELLS -> SNOWBALLS -> NUGGETS -> PIZZAS -> SNOWBALLS -> SEASHELLS -> SEASHELLS
+# Most profitable arbitrage cycle: SEASHELLS -> SNOWBALLS -> NUGGETS -> PIZZAS -> SNOWBALLS -> SEASHELLS
 # Profit multiplier: 1.088680x
\ No newline at end of file